@@ -0,0 +1,103 @@
+"""
+measures the start-up cost of the GUI: time until the main window is shown,
+and a -X importtime breakdown of the modules imported on the way there
+
+usage:
+	python bench_startup.py [--runs N] [--top N] [--compare OTHER_SRC_DIR]
+
+--compare runs the same measurement in another checkout of src/ (e.g. an older
+revision extracted with `git worktree add`) and prints both side by side
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+# modules that should no longer be imported before the window shows
+HEAVY_MODULES = ['openai', 'PyPDF2', 'tiktoken', 'PyQt5.uic']
+
+WINDOW_SCRIPT = """
+import os, time
+start = time.perf_counter()
+from PyQt5 import QtWidgets
+app = QtWidgets.QApplication([])
+import pdf2eval
+window = pdf2eval.Window()
+print(time.perf_counter() - start, flush = True)
+os._exit(0) # skip the background warm-up and the event loop
+"""
+
+def parse_importtime(report : str) -> list[tuple[str, int, int]]:
+	"""
+	parses the stderr of python -X importtime
+	returns a list of (module, self us, cumulative us) for top-level imports only
+	"""
+	ret = []
+	for line in report.splitlines():
+		if not line.startswith('import time:') or 'imported package' in line:
+			continue
+		self_us, cumulative_us, name = line[len('import time:'):].split('|')
+		# nested imports are indented below the module that imported them
+		if name.startswith('  '):
+			continue
+		ret.append((name.strip(), int(self_us), int(cumulative_us)))
+	return ret
+
+def imported_modules(report : str) -> set[str]:
+	ret = set()
+	for line in report.splitlines():
+		if line.startswith('import time:') and 'imported package' not in line:
+			ret.add(line.split('|')[-1].strip())
+	return ret
+
+def measure(src_dir : str, runs : int) -> tuple[list[float], str]:
+	"""
+	returns the time-to-window of each run in seconds and the import report of the last run
+	"""
+	env = dict(os.environ)
+	env.setdefault('QT_QPA_PLATFORM', 'offscreen')
+	times = []
+	report = ''
+	for _ in range(runs):
+		proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', WINDOW_SCRIPT],
+			cwd = src_dir, env = env, capture_output = True, text = True)
+		if proc.returncode != 0:
+			raise RuntimeError('benchmark run failed in {}:\n{}'.format(src_dir, proc.stderr[-2000:]))
+		times.append(float(proc.stdout.strip().splitlines()[-1]))
+		report = proc.stderr
+	return times, report
+
+def print_report(label : str, times : list[float], report : str, top : int):
+	imports = parse_importtime(report)
+	modules = imported_modules(report)
+	print('== {} =='.format(label))
+	print('time to window: median {:.1f} ms, min {:.1f} ms over {} runs'.format(
+		statistics.median(times) * 1000, min(times) * 1000, len(times)))
+	print('total import time: {:.1f} ms'.format(sum(c for _, _, c in imports) / 1000))
+	print('heavy modules imported before window: {}'.format(
+		', '.join(m for m in HEAVY_MODULES if m in modules) or 'none'))
+	print('{:>12} {:>12}  {}'.format('self [us]', 'cumul [us]', 'module'))
+	for name, self_us, cumulative_us in sorted(imports, key = lambda x: -x[2])[:top]:
+		print('{:>12} {:>12}  {}'.format(self_us, cumulative_us, name))
+	print()
+
+def main():
+	parser = argparse.ArgumentParser(description = 'measure GUI start-up time')
+	parser.add_argument('--runs', type = int, default = 5)
+	parser.add_argument('--top', type = int, default = 15)
+	parser.add_argument('--compare', default = None, help = 'another src/ directory to measure as a baseline')
+	args = parser.parse_args()
+
+	src_dir = os.path.dirname(os.path.abspath(__file__))
+	if args.compare is not None:
+		base_times, base_report = measure(args.compare, args.runs)
+		print_report('baseline: ' + args.compare, base_times, base_report, args.top)
+	times, report = measure(src_dir, args.runs)
+	print_report('current: ' + src_dir, times, report, args.top)
+	if args.compare is not None:
+		speedup = statistics.median(base_times) / statistics.median(times)
+		print('time to window is {:.2f}x the speed of the baseline'.format(speedup))
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,120 @@
+import json
+import os
+import threading
+import urllib.error
+import urllib.request
+
+from PyQt5.QtCore import QThread, pyqtSignal
+
+import config
+from pdf2eval import PdfWorker, get_result_types
+from request_queue import RequestQueue
+
+
+class RemoteWorker(QThread):
+	"""
+	a drop-in replacement of PdfWorker that forwards the requests of the GUI
+	to a pdf2eval service (see server.py) instead of running the pipeline itself
+	"""
+	progress_signal = pyqtSignal(str, int, int)
+
+	def __init__(self, parent, pdf_name : str, params, server_url : str):
+		super().__init__(parent)
+		self.pdf_name = pdf_name
+		# same coalescing as a local worker, and a superseded job is stopped on the service
+		# right away instead of after its progress stream ends
+		self.request_queue = RequestQueue(
+			coalesce = { PdfWorker.REDO_REQUEST },
+			supersede = { PdfWorker.PROCESS_REQUEST, PdfWorker.TERMINATE_REQUEST },
+			on_supersede = self.cancel_job)
+		self.params = params
+		self.server_url : str = server_url.rstrip('/')
+		self.job_id : str | None = None
+
+	def _call(self, method : str, path : str, body : dict | None = None) -> dict:
+		data = json.dumps(body).encode('utf-8') if body is not None else None
+		req = urllib.request.Request(self.server_url + path, data = data, method = method,
+			headers = { 'Content-Type' : 'application/json' })
+		with urllib.request.urlopen(req) as resp:
+			return json.load(resp)
+
+	def cancel_job(self):
+		"""
+		stops the current job on the service, which ends the progress stream being followed
+		called from the thread that put the superseding request, so the call is made in the background
+		"""
+		job_id = self.job_id
+		if job_id is not None:
+			threading.Thread(target = self._delete_job, args = (job_id,), daemon = True).start()
+
+	def _delete_job(self, job_id : str):
+		try:
+			self._call('DELETE', '/jobs/{}'.format(job_id))
+		except (urllib.error.URLError, OSError) as e:
+			print('request to pdf2eval service failed: {}'.format(e))
+
+	def _follow(self, since : int):
+		"""
+		relays the progress events of the job until it is idle, then saves its results
+		"""
+		url = '{}/jobs/{}/events?since={}'.format(self.server_url, self.job_id, since)
+		event = None
+		with urllib.request.urlopen(url) as resp:
+			for line in resp:
+				line = line.decode('utf-8').strip()
+				if not line.startswith('data:'):
+					continue
+				event = json.loads(line[len('data:'):])
+				if event['status'] == 'running' and event['total'] > 0:
+					self.progress_signal.emit(event['message'], event['progress'], event['total'])
+		if self.request_queue.should_discard():
+			return
+		if event is not None and event['status'] != 'done':
+			print('job {} {}: {}'.format(self.job_id, event['status'], event['message']))
+		else:
+			with urllib.request.urlopen('{}/jobs/{}/result?format=plain'.format(self.server_url, self.job_id)) as resp:
+				with open(config.OUTPUT_FILE, 'wb') as text_file:
+					text_file.write(resp.read())
+
+	def _finish(self):
+		self.progress_signal.emit('', 1, 1)
+
+	def run(self):
+		while True:
+			task_type, arg = self.request_queue.get()
+			terminate = task_type == PdfWorker.TERMINATE_REQUEST
+			try:
+				if task_type == PdfWorker.PROCESS_REQUEST:
+					self.progress_signal.emit('', 0, 1)
+					job = self._call('POST', '/jobs', {
+						'path' : os.path.abspath(self.pdf_name),
+						'params' : {
+							'summary_algorithm' : self.params.summary_algorithm,
+							'qa_algorithm' : self.params.qa_algorithm,
+							'writing_sample' : self.params.writing_sample,
+						},
+					})
+					self.job_id = job['id']
+					if self.request_queue.should_discard():
+						# superseded before the job id was known
+						self._delete_job(self.job_id)
+					else:
+						self._follow(0)
+				elif task_type == PdfWorker.REDO_REQUEST:
+					redo_type, = arg
+					self.progress_signal.emit('', 0, 1)
+					reply = self._call('POST', '/jobs/{}/redo'.format(self.job_id),
+						{ 'section' : get_result_types()[redo_type] })
+					self._follow(reply['since'])
+				elif terminate:
+					if self.job_id is not None:
+						self._call('DELETE', '/jobs/{}'.format(self.job_id))
+				else:
+					raise RuntimeError('unknown worker request: {}'.format(task_type))
+			except (urllib.error.URLError, OSError) as e:
+				print('request to pdf2eval service failed: {}'.format(e))
+			if terminate:
+				break
+			if not self.request_queue.should_discard():
+				self._finish()
+			self.request_queue.task_done()
@@ -25,6 +25,18 @@ IMITATION_PROMPT_FMT = "Given a writing sample:\n{}\nImitate this style, re-writ
 
 WRITING_SAMPLE = 'writing_sample'
 
+# speculative redo: alternate drafts of each section are generated while the worker is idle
+# SPECULATIVE_DRAFTS is the number of drafts kept ready per section, 0 (the default) disables it
+# SPECULATIVE_TOKEN_CAP is the maximum number of tokens spent on drafts per paper
+SPECULATIVE_DRAFTS = 'speculative_drafts'
+SPECULATIVE_TOKEN_CAP = 'speculative_token_cap'
+DEFAULT_SPECULATIVE_DRAFTS = 0
+DEFAULT_SPECULATIVE_TOKEN_CAP = 20000
+
+# maximum number of requests per minute sent to OpenAI by the whole process, 0 for unlimited
+RATE_LIMIT_RPM = 'rate_limit_rpm'
+DEFAULT_RATE_LIMIT_RPM = 0
+
 class SummaryAlgorithm:
 	FULL_CONTEXT : int = 0
 	NAIVE : int = 1
@@ -32,9 +44,26 @@ class SummaryAlgorithm:
 class QAAlgorithm:
 	FULL_CONTEXT : int = 0
 	NAIVE : int = 1
+	RETRIEVAL : int = 2
+
+# retrieval QA: passages are retrieved from a local BM25 index over the page text
+RETRIEVAL_PASSAGE_WORDS = 120
+RETRIEVAL_TOP_K = 6
+RETRIEVAL_TOKEN_BUDGET = 1500
+# the query of a section is its question plus these terms, weighted above the terms of the summary
+RETRIEVAL_QUERY_TERMS = {
+	'INTERESTING' : "novel contribution contributions key idea insight surprising outperforms improvement results",
+	'DISLIKE' : "limitation limitations assumption assumptions drawback fails failure unclear however future work",
+	'QUESTION' : "method implementation experiment experiments evaluation ablation parameters baseline compared trade",
+}
+RETRIEVAL_QUESTION_WEIGHT = 3.0
+RETRIEVAL_SUMMARY_TERMS = 8 # most specific terms of the summary added to each query
+RETRIEVAL_PROMPT = "the following passages are excerpts of the paper relevant to the question: \n"
 
 API_KEY_FILE = './key.txt'
 CONFIG_FILE = './config.json'
+RESULTS_DB = './results.db'
+OUTPUT_FILE = './out.txt'
 
 def load_last_api_key():
 	if os.path.exists(API_KEY_FILE):
@@ -44,27 +73,33 @@ def set_api_key(val : str):
 	with open(API_KEY_FILE, 'w') as f:
 		f.write(val)
 
-if os.path.exists(CONFIG_FILE):
-	with open(CONFIG_FILE, 'r', encoding = 'utf-8') as f:
-		data = json.load(f)
-else:
-	data = {}
+data : dict | None = None # loaded on first access
+
+def _get_data() -> dict:
+	global data
+	if data is None:
+		if os.path.exists(CONFIG_FILE):
+			with open(CONFIG_FILE, 'r', encoding = 'utf-8') as f:
+				data = json.load(f)
+		else:
+			data = {}
+	return data
 
-def get(name : str):
-	if name in data:
+def get(name : str, default = ''):
+	if name in _get_data():
 		return data[name]
 	else:
-		return ''
+		return default
 
 def set(name : str, val):
-	data[name] = val
+	_get_data()[name] = val
 
 def get_imitation_prompt(sample : str, text : str) -> str:
 	return IMITATION_PROMPT_FMT.format(sample, text)
 
 def save():
 	with open(CONFIG_FILE, 'w', encoding = 'utf-8') as f:
-		json.dump(data, f)
+		json.dump(_get_data(), f)
 if __name__ == "__main__":
-	print(data)
+	print(_get_data())
 	save()
\ No newline at end of file
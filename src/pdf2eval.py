@@ -1,15 +1,32 @@
-# todo: fix bug when user clicks process again after attach
+import argparse
+import hashlib
+import importlib
 import os
 import sys
-from queue import Queue
+import threading
+from collections import Counter
 
-import openai
-import PyPDF2
-from PyQt5 import QtWidgets, uic
-from PyQt5.QtCore import QThread, pyqtSignal
+# openai, PyPDF2 and tiktoken are imported lazily to keep start-up fast, see warm_up()
+from PyQt5 import QtWidgets
+from PyQt5.QtCore import QThread, QTimer, pyqtSignal
 
 import config
-from prompt import Prompt
+import profiling
+import prompt
+from prompt import Prompt, RequestCancelled
+from request_queue import RequestQueue
+from retrieval import BM25Index, split_passages, tokenize
+from store import ResultStore, hash_file, write_plain
+
+try:
+	# precompiled with: pyuic5 window.ui -o window_ui.py
+	from window_ui import Ui_pdf2eval
+except ImportError:
+	class Ui_pdf2eval(object):
+		# falls back to parsing window.ui at runtime
+		def setupUi(self, window):
+			from PyQt5 import uic
+			uic.loadUi('window.ui', window)
 
 
 class ResultSectionType:
@@ -26,9 +43,24 @@ def get_result_types() -> list[str]:
 				ret.append(attr_name)
 	return ret
 
+def warm_up():
+	"""
+	loads the PDF and OpenAI backends and the tokenizer after the window is shown,
+	so neither start-up nor the first request pays for them
+	"""
+	try:
+		# only imported for their side effect of being loaded, so that later imports are free
+		for module in ('openai', 'PyPDF2'):
+			importlib.import_module(module)
+		prompt.get_encoding()
+	except BaseException as e:
+		print("background warm-up failed: {}".format(e))
+
 class WorkerResult(object):
 	def __init__(self):
 		super().__init__()
+		self.run_id : int | None = None # id of the run in the results store
+		self.paper_pages : list[str] = []
 		self.paper_section_summary : list[str] = []
 		self.results : dict[str,str] = {}
 	
@@ -41,11 +73,7 @@ class WorkerResult(object):
 		return self.results[name]
 	
 	def write_plain(self, file):
-		for _, text in self.results.items():
-			file.write(text)
-			file.write('\n')
-			file.write('-' * 20)
-			file.write('\n')
+		write_plain(self.results, file)
 
 class GenerationParams(object):
 	def __init__(self) -> None:
@@ -53,26 +81,55 @@ class GenerationParams(object):
 		self.summary_algorithm = config.SummaryAlgorithm.NAIVE
 		self.qa_algorithm = config.QAAlgorithm.NAIVE
 		self.writing_sample = ''
+		self.speculative_drafts : int = config.get(config.SPECULATIVE_DRAFTS, config.DEFAULT_SPECULATIVE_DRAFTS)
+		self.speculative_token_cap : int = config.get(config.SPECULATIVE_TOKEN_CAP, config.DEFAULT_SPECULATIVE_TOKEN_CAP)
+
+	def to_dict(self) -> dict:
+		"""
+		the params that affect the results, used as part of the key of a stored run
+		"""
+		sample = hashlib.sha256(self.writing_sample.encode('utf-8')).hexdigest()[:16] if self.writing_sample else ''
+		return {
+			'summary_algorithm' : self.summary_algorithm,
+			'qa_algorithm' : self.qa_algorithm,
+			'writing_sample' : sample,
+		}
 
 class PdfWorker(QThread):
 	PROCESS_REQUEST = 0
 	REDO_REQUEST = 1
 	TERMINATE_REQUEST = 2
+	RESUME_REQUEST = 3
 	
 	progress_signal = pyqtSignal(str, int, int)
 	result_receiver_signal = pyqtSignal(WorkerResult)
 
-	def __init__(self, parent, pdf_name : str, params : GenerationParams):
+	def __init__(self, parent, pdf_name : str, params : GenerationParams, export_plain : bool = True):
 		super().__init__(parent)
 		self.pdf_name = pdf_name
-		self.request_queue = Queue()
+		self.exports_plain : bool = export_plain # write config.OUTPUT_FILE after every request
+		# redos of the same section are coalesced, and a new PROCESS, RESUME or TERMINATE
+		# cancels everything else, so no API calls are spent on superseded results
+		self.request_queue = RequestQueue(
+			coalesce = { PdfWorker.REDO_REQUEST },
+			supersede = { PdfWorker.PROCESS_REQUEST, PdfWorker.RESUME_REQUEST, PdfWorker.TERMINATE_REQUEST })
 		self.params = params
+		self.index : BM25Index | None = None # built lazily for retrieval QA
+		self.result : WorkerResult | None = None
+		self.tokens_used : int = 0
+		# speculative redo: section type -> drafts ready to be swapped in
+		self.drafts : dict[int, list[str]] = {}
+		self.drafts_params : tuple | None = None # params the drafts were generated with
+		self.speculative_tokens : int = 0
+		# section type -> (tokens billed once per request, tokens billed for each text) of it
+		self.draft_costs : dict[int, tuple[int, int]] = {}
+		self.store : ResultStore | None = None # opened by the worker thread
 
 	def update_prog(self, msg = ''):
 		self.cur_prog = min(self.cur_prog + 1, self.total_prog)
 		self.progress_signal.emit(msg, self.cur_prog, self.total_prog)
 
-	def process_sections(self, pages) -> list[str]:
+	def process_sections(self, pages : list[str]) -> list[str]:
 		p = Prompt()
 		p.add(Prompt.SYS).add(config.SUMMARY_SYS_PROMPT)
 
@@ -86,7 +143,7 @@ class PdfWorker(QThread):
 			# formulate user prompt
 			user = p.add(Prompt.USER)
 			(user.add_important(config.SUMMARY_USER_PROMPT + '\n')
-				.add(page.extract_text()))
+				.add(page))
 
 			cur_page_summary = p.dispatch()
 			if self.params.summary_algorithm == config.SummaryAlgorithm.FULL_CONTEXT:
@@ -101,7 +158,17 @@ class PdfWorker(QThread):
 		return page_summary
 
 	@staticmethod
-	def _get_result_section_prompt(page_summary : list[str], type : int) -> Prompt:
+	def _get_question_prompt(type : int) -> str:
+		if type == ResultSectionType.INTERESTING:
+			return config.INTERESTING_PROMPT
+		elif type == ResultSectionType.DISLIKE:
+			return config.DISLIKE_PROMPT
+		elif type == ResultSectionType.QUESTION:
+			return config.QUESTION_PROMPT
+		raise RuntimeError('no question for section type: {}'.format(type))
+
+	@staticmethod
+	def _get_result_section_prompt(page_summary : list[str], type : int, passages : list[str] | None = None) -> Prompt:
 		p = Prompt()
 		if type == ResultSectionType.SUMMARY:
 			# p.add(Prompt.SYS).add()
@@ -112,103 +179,286 @@ class PdfWorker(QThread):
 			assist = p.add(Prompt.ASSIST).add_important("the summary of the paper is: \n")
 			for summary in page_summary:
 				assist.add(summary)
+			if passages:
+				assist = p.add(Prompt.ASSIST).add_important(config.RETRIEVAL_PROMPT)
+				for passage in passages:
+					assist.add(passage + '\n')
 			for spice in config.SPICE:
 				assist = p.add(Prompt.ASSIST).add(spice)
 
 			user = (p.add(Prompt.USER)
 					.add_important("please answer the following question based on the summary of the academic paper provided above"))
-			if type == ResultSectionType.INTERESTING:
-				user.add(config.INTERESTING_PROMPT)
-			elif type == ResultSectionType.DISLIKE:
-				user.add(config.DISLIKE_PROMPT)
-			elif type == ResultSectionType.QUESTION:
-				user.add(config.QUESTION_PROMPT)
+			user.add(PdfWorker._get_question_prompt(type))
 		return p
-	
-	def get_result(self, page_summary : list[str], type : int) -> str:
-		p = PdfWorker._get_result_section_prompt(page_summary, type)
+
+	def set_section(self, name : str, text : str):
+		self.result.set_section(name, text)
+		with profiling.span('store'):
+			self.store.put_section(self.result.run_id, name, text)
+
+	def export_plain(self):
+		if not self.exports_plain:
+			return
+		with open(config.OUTPUT_FILE, 'w', encoding = 'utf-8') as text_file:
+			self.result.write_plain(text_file)
+
+	def get_passages(self, type : int, total_summary : str) -> list[str]:
+		"""
+		retrieves the page passages most relevant to the question of the given section
+		the question decides what is retrieved, the most specific terms of the paper summary
+		are added with a lower weight so that paper-specific terms are matched
+		"""
+		if self.index is None:
+			with profiling.span('index'):
+				self.index = BM25Index(split_passages(self.result.paper_pages, config.RETRIEVAL_PASSAGE_WORDS))
+		question = PdfWorker._get_question_prompt(type) + '\n' + config.RETRIEVAL_QUERY_TERMS.get(get_result_types()[type], '')
+		query = { term : config.RETRIEVAL_QUESTION_WEIGHT * tf for term, tf in Counter(tokenize(question)).items() }
+		for term in self.index.top_terms(total_summary, config.RETRIEVAL_SUMMARY_TERMS):
+			query[term] = query.get(term, 0) + 1
+		encoding = prompt.get_encoding()
+		with profiling.span('retrieve'):
+			return self.index.retrieve(query, config.RETRIEVAL_TOP_K, config.RETRIEVAL_TOKEN_BUDGET,
+				lambda text: len(encoding.encode(text)))
+
+	def get_results(self, page_summary : list[str], type : int, passages : list[str] | None = None, n : int = 1) -> list[str]:
+		p = PdfWorker._get_result_section_prompt(page_summary, type, passages)
+		try:
+			texts = p.dispatch_n(n)
+		finally:
+			self.tokens_used += p.num_tokens_used
+		# the prompt is billed once for all n texts, the completions once per text
+		request_cost = p.num_prompt_tokens
+		text_cost = -(-(p.num_tokens_used - p.num_prompt_tokens) // len(texts))
 		if len(self.params.writing_sample) > 0:
-			text = p.dispatch()
-			p = Prompt()
-			p.add(Prompt.USER).add_important(config.IMITATION_PROMPT_FMT.format(self.params.writing_sample, text))
-		return p.dispatch()
+			imitations = []
+			imitation_tokens = 0
+			for text in texts:
+				p = Prompt()
+				p.add(Prompt.USER).add_important(config.IMITATION_PROMPT_FMT.format(self.params.writing_sample, text))
+				try:
+					imitations.append(p.dispatch())
+				except RequestCancelled as e:
+					# preempted idle work keeps the drafts it already paid for
+					if e.discard or len(imitations) == 0:
+						raise
+					break
+				finally:
+					self.tokens_used += p.num_tokens_used
+					imitation_tokens += p.num_tokens_used
+			texts = imitations
+			# every text is imitated in a request of its own
+			text_cost += -(-imitation_tokens // len(texts))
+		self.draft_costs[type] = (request_cost, text_cost)
+		return texts
+
+	def get_result(self, page_summary : list[str], type : int, passages : list[str] | None = None) -> str:
+		return self.get_results(page_summary, type, passages)[0]
+
+	def generate_section(self, type : int, n : int = 1) -> list[str]:
+		"""
+		generates n alternative texts of a result section of the current paper
+		"""
+		all_summary = self.result.paper_section_summary
+		if self.params.qa_algorithm == config.QAAlgorithm.FULL_CONTEXT or type == ResultSectionType.SUMMARY:
+			return self.get_results(all_summary, type, n = n)
+		total_summary = self.result.get_section(get_result_types()[ResultSectionType.SUMMARY])
+		if self.params.qa_algorithm == config.QAAlgorithm.RETRIEVAL:
+			return self.get_results([total_summary], type, self.get_passages(type, total_summary), n)
+		return self.get_results(all_summary, type, n = n)
+
+	def _get_drafts_params(self) -> tuple:
+		return (self.params.summary_algorithm, self.params.qa_algorithm, self.params.writing_sample)
+
+	def take_draft(self, type : int) -> str | None:
+		"""
+		pops a pre-generated draft of the section, if one was generated with the current params
+		"""
+		if self.drafts_params != self._get_drafts_params():
+			self.drafts = {}
+			return None
+		pool = self.drafts.get(type)
+		if not pool:
+			return None
+		return pool.pop(0)
+
+	def refill_drafts(self) -> bool:
+		"""
+		generates the missing drafts of one section while the worker is idle
+		returns False if there is nothing left to do or the spend cap would be exceeded
+		"""
+		if self.result is None or len(self.result.results) == 0:
+			return False
+		if self.params.speculative_drafts <= 0 or self.speculative_tokens >= self.params.speculative_token_cap:
+			return False
+		if self.drafts_params != self._get_drafts_params():
+			self.drafts = {}
+			self.drafts_params = self._get_drafts_params()
+		for type in range(len(get_result_types())):
+			pool = self.drafts.setdefault(type, [])
+			missing = self.params.speculative_drafts - len(pool)
+			# only request as many drafts as the remaining budget is expected to pay for,
+			# based on what the last request of this section cost, so that a refill
+			# stops early rather than late
+			cost = self.draft_costs.get(type)
+			if missing <= 0 or cost is None:
+				continue
+			request_cost, text_cost = cost
+			budget = self.params.speculative_token_cap - self.speculative_tokens - request_cost
+			missing = min(missing, budget // max(text_cost, 1))
+			if missing <= 0:
+				continue
+			tokens_before = self.tokens_used
+			try:
+				with profiling.request('speculate'):
+					texts = self.generate_section(type, missing)
+			except RequestCancelled:
+				# superseded, or preempted before any draft was complete
+				self.add_speculative_tokens(self.tokens_used - tokens_before)
+				return False
+			except BaseException as e:
+				print("speculative generation failed: {}".format(e))
+				return False
+			self.add_speculative_tokens(self.tokens_used - tokens_before)
+			# drop drafts generated while the params changed
+			if self.drafts_params == self._get_drafts_params():
+				pool.extend(texts)
+			return True
+		return False
+
+	def add_speculative_tokens(self, tokens : int):
+		# kept with the run, so that the cap holds across workers resuming it
+		self.speculative_tokens += tokens
+		if tokens > 0:
+			with profiling.span('store'):
+				self.store.add_speculative_tokens(self.result.run_id, tokens)
+
+	def set_result(self, result : WorkerResult):
+		self.result = result
+		self.index = None
+		self.drafts = {}
+
+	def process(self):
+		import PyPDF2
+		result_section_types = get_result_types()
 
-	def run(self):
+		self.set_result(WorkerResult())
+		self.result.run_id = self.store.start_run(hash_file(self.pdf_name),
+			os.path.basename(self.pdf_name), self.params.to_dict())
+		self.speculative_tokens = 0
+
+		self.cur_prog = 0
+		reader = PyPDF2.PdfFileReader(self.pdf_name)
+		self.total_prog = len(reader.pages) + len(result_section_types) + 1
+
+		with profiling.span('extract_text'):
+			self.result.paper_pages = [page.extract_text() for page in reader.pages]
+		self.result.paper_section_summary = self.process_sections(self.result.paper_pages)
+		all_summary = self.result.paper_section_summary
+		with profiling.span('store'):
+			self.store.put_pages(self.result.run_id, self.result.paper_pages, all_summary)
+
+		if self.params.qa_algorithm == config.QAAlgorithm.FULL_CONTEXT:
+			for i, type_name in enumerate(result_section_types):
+				result = self.get_result(all_summary, i)
+				self.set_section(type_name, result)
+				self.update_prog('writing section {}'.format(type_name))
+		else:
+			# naive approach uses the total summary as context for answering questions
+			# retrieval approach additionally adds the most relevant passages of the paper
+			type = ResultSectionType.SUMMARY
+			total_summary = self.get_result(all_summary, type)
+			self.set_section(result_section_types[type], total_summary)
+			self.update_prog('writing section {}'.format(result_section_types[type]))
+
+			for i, type_name in enumerate(result_section_types):
+				if i == ResultSectionType.SUMMARY:
+					continue
+				passages = None
+				if self.params.qa_algorithm == config.QAAlgorithm.RETRIEVAL:
+					passages = self.get_passages(i, total_summary)
+				self.set_section(type_name, 
+					self.get_result([total_summary], i, passages))
+				self.update_prog('writing section {}'.format(type_name))
+
+		self.export_plain()
+		self.update_prog()
+
+	def resume(self, run_id : int):
+		"""
+		continues a stored run so that its sections can be redone without processing the paper again
+		runs stored without their pages are processed again
+		"""
+		pages = self.store.get_pages(run_id)
+		if len(pages) == 0:
+			self.process()
+			return
+		result = WorkerResult()
+		result.run_id = run_id
+		result.paper_pages = [text for text, _ in pages]
+		result.paper_section_summary = [summary for _, summary in pages]
+		result.results = self.store.get_sections(run_id)
+		self.set_result(result)
+		self.speculative_tokens = self.store.get_speculative_tokens(run_id)
+
+	def redo(self, redo_type : int):
 		result_section_types = get_result_types()
+		self.cur_prog, self.total_prog = 0, 2
+		self.update_prog('rewriting section {}'.format(result_section_types[redo_type]))
+
+		text = self.take_draft(redo_type)
+		if text is None:
+			text = self.generate_section(redo_type)[0]
+		self.set_section(result_section_types[redo_type], text)
+		if redo_type == ResultSectionType.SUMMARY and self.params.qa_algorithm == config.QAAlgorithm.RETRIEVAL:
+			# the drafts of the other sections were generated from the previous summary
+			self.drafts = { ResultSectionType.SUMMARY : self.drafts.get(ResultSectionType.SUMMARY, []) }
+		self.export_plain()
+		self.update_prog()
+
+	def run(self):
+		self.store = ResultStore(config.RESULTS_DB)
+		prompt.set_cancel_check(self.request_queue.should_stop, self.request_queue.should_discard)
 
 		while True:
+			# use idle time to pre-generate drafts for instant redo
+			if self.request_queue.empty() and self.refill_drafts():
+				continue
 			task_type, arg = self.request_queue.get()
-			if task_type == PdfWorker.PROCESS_REQUEST:
-				self.result = WorkerResult()
-
-				self.cur_prog = 0
-				reader = PyPDF2.PdfFileReader(self.pdf_name)
-				self.total_prog = len(reader.pages) + len(result_section_types) + 1
-
-				with open('out.txt', 'w', encoding="utf-8") as text_file:
-					self.result.paper_section_summary = self.process_sections(reader.pages)
-					all_summary = self.result.paper_section_summary
-					# text_file.write(str(section_summary))
-					# text_file.write('\n\n')
-
-					if self.params.qa_algorithm == config.QAAlgorithm.FULL_CONTEXT:
-						for i, type_name in enumerate(result_section_types):
-							result = self.get_result(all_summary, i)
-							self.result.set_section(type_name, result)
-							self.update_prog('writing section {}'.format(type_name))
-					else:
-						# naive approach uses the total summary as context for answering questions
-						type = ResultSectionType.SUMMARY
-						total_summary = self.get_result(all_summary, type)
-						self.result.set_section(result_section_types[type], total_summary)
-						self.update_prog('writing section {}'.format(result_section_types[type]))
-
-						for i, type_name in enumerate(result_section_types):
-							if i == ResultSectionType.SUMMARY:
-								continue
-							self.result.set_section(type_name, 
-								self.get_result([total_summary], i))
-							self.update_prog('writing section {}'.format(type_name))
-
-					self.result.write_plain(text_file)
-					self.update_prog()
-			elif task_type == PdfWorker.REDO_REQUEST:
-				redo_type, = arg
-				self.cur_prog, self.total_prog = 0, 2
-				all_summary = self.result.paper_section_summary
-				self.update_prog('rewriting section {}'.format(result_section_types[redo_type]))
-
-				if self.params.qa_algorithm == config.QAAlgorithm.FULL_CONTEXT:
-					text = self.get_result(all_summary, redo_type)
-					self.result.set_section(result_section_types[redo_type], text)
+			try:
+				if task_type == PdfWorker.PROCESS_REQUEST:
+					with profiling.request('process'):
+						self.process()
+				elif task_type == PdfWorker.REDO_REQUEST:
+					redo_type, = arg
+					with profiling.request('redo'):
+						self.redo(redo_type)
+				elif task_type == PdfWorker.RESUME_REQUEST:
+					run_id, = arg
+					self.resume(run_id)
+				elif task_type == PdfWorker.TERMINATE_REQUEST:
+					self.store.close()
+					break
 				else:
-					if redo_type == ResultSectionType.SUMMARY:
-						total_summary = self.get_result(all_summary, redo_type)
-						self.result.set_section(result_section_types[redo_type], total_summary)
-					else:
-						total_summary = self.result.get_section(result_section_types[ResultSectionType.SUMMARY])
-						text = self.get_result(all_summary, redo_type)
-						self.result.set_section(result_section_types[redo_type], text)
-				with open('out.txt', 'w', encoding="utf-8") as text_file:
-					self.result.write_plain(text_file)
-				self.update_prog()
-
-			elif task_type == PdfWorker.TERMINATE_REQUEST:
-				break
-			else:
-				raise RuntimeError('unknown worker request: {}'.format(task_type))
-
-class Window(QtWidgets.QMainWindow):
-	def __init__(self):
+					raise RuntimeError('unknown worker request: {}'.format(task_type))
+			except RequestCancelled:
+				# superseded by a newer request, which is already queued
+				pass
+			finally:
+				self.request_queue.task_done()
+
+class Window(QtWidgets.QMainWindow, Ui_pdf2eval):
+	def __init__(self, server_url : str | None = None):
 		super().__init__()
-		openai.api_key = config.load_last_api_key()
+		self.server_url = server_url # when set, the GUI is a thin client of a pdf2eval service
+		self.api_key = config.load_last_api_key() or ''
+		prompt.set_api_key(self.api_key)
 		self.init_ui()
 		self.pdf_file = ''
 		self.worker_params = GenerationParams() # Worker readonly, Window RW
 		self.worker = None
 
 	def init_ui(self):
-		uic.loadUi('window.ui', self)
+		self.setupUi(self)
 		self.browseBtn.clicked.connect(self.get_pdf)
 		self.processBtn.clicked.connect(self.process_pdf)
 		self.processBtn.setEnabled(False)
@@ -216,18 +466,22 @@ class Window(QtWidgets.QMainWindow):
 		self.contextSummaryBtn.setCheckState(0)
 		self.fullContextQABtn.stateChanged.connect(self.set_qa_algorithm)
 		self.fullContextQABtn.setCheckState(0)
+		self.retrievalQABtn.stateChanged.connect(self.set_qa_algorithm)
+		self.retrievalQABtn.setCheckState(0)
 		self.redoBtn1.clicked.connect(lambda : self.send_worker_request(PdfWorker.REDO_REQUEST, ResultSectionType.SUMMARY))
 		self.redoBtn2.clicked.connect(lambda : self.send_worker_request(PdfWorker.REDO_REQUEST, ResultSectionType.INTERESTING))
 		self.redoBtn3.clicked.connect(lambda : self.send_worker_request(PdfWorker.REDO_REQUEST, ResultSectionType.DISLIKE))
 		self.redoBtn4.clicked.connect(lambda : self.send_worker_request(PdfWorker.REDO_REQUEST, ResultSectionType.QUESTION))
 		self.paraphraseBtn.clicked.connect(self.redo_all)
-		self.apiKeyText.setText(openai.api_key)
+		self.apiKeyText.setText(self.api_key)
 		self.apiKeyText.editingFinished.connect(self.set_api_key)
 		self.sampleWritingText.setPlainText(config.get(config.WRITING_SAMPLE))
 		self.sampleWritingText.textChanged.connect(self.set_writing_sample)
 
 		self.set_pdf_dependent_btns(False)
 		self.show()
+		if self.server_url is None:
+			QTimer.singleShot(0, lambda : threading.Thread(target = warm_up, daemon = True).start())
 
 	def get_pdf(self):
 		fname = QtWidgets.QFileDialog.getOpenFileName(self, 'Open PDF', '', 'PDF Files (*.pdf)')
@@ -252,7 +506,11 @@ class Window(QtWidgets.QMainWindow):
 		if self.worker is not None:
 			self.worker.request_queue.put((type, args))
 	def new_worker(self):
-		self.worker = PdfWorker(self, self.pdf_file, self.worker_params)
+		if self.server_url is not None:
+			from client import RemoteWorker
+			self.worker = RemoteWorker(self, self.pdf_file, self.worker_params, self.server_url)
+		else:
+			self.worker = PdfWorker(self, self.pdf_file, self.worker_params)
 		self.worker.progress_signal.connect(self.set_progress)
 		self.worker.start()
 	def redo_all(self):
@@ -261,6 +519,9 @@ class Window(QtWidgets.QMainWindow):
 		self.send_worker_request(PdfWorker.REDO_REQUEST, ResultSectionType.DISLIKE)
 		self.send_worker_request(PdfWorker.REDO_REQUEST, ResultSectionType.QUESTION)
 	def process_pdf(self):
+		# the old worker cancels what it is doing, and its late progress must not reach the UI
+		if self.worker is not None:
+			self.worker.progress_signal.disconnect()
 		self.send_worker_request(PdfWorker.TERMINATE_REQUEST)
 		self.new_worker()
 		self.browseBtn.setEnabled(False)
@@ -269,7 +530,8 @@ class Window(QtWidgets.QMainWindow):
 		self.send_worker_request(PdfWorker.PROCESS_REQUEST)
 
 	def set_api_key(self):
-		openai.api_key = self.apiKeyText.text()
+		self.api_key = self.apiKeyText.text()
+		prompt.set_api_key(self.api_key)
 		config.set_api_key(self.apiKeyText.text())
 	
 	def set_writing_sample(self):
@@ -283,7 +545,10 @@ class Window(QtWidgets.QMainWindow):
 			self.worker_params.summary_algorithm = config.SummaryAlgorithm.NAIVE
 
 	def set_qa_algorithm(self, state : int):
-		if state > 0:
+		# retrieval takes precedence over full context when both are checked
+		if self.retrievalQABtn.checkState() > 0:
+			self.worker_params.qa_algorithm = config.QAAlgorithm.RETRIEVAL
+		elif self.fullContextQABtn.checkState() > 0:
 			self.worker_params.qa_algorithm = config.QAAlgorithm.FULL_CONTEXT
 		else:
 			self.worker_params.qa_algorithm = config.QAAlgorithm.NAIVE
@@ -308,9 +573,17 @@ class Window(QtWidgets.QMainWindow):
 			self.print(msg)
 
 if __name__ == "__main__":
+	if len(sys.argv) > 1 and sys.argv[1] == 'serve':
+		import server
+		sys.exit(server.main(sys.argv[2:]))
+
+	parser = argparse.ArgumentParser(description = 'generate a paper evaluation from a PDF file')
+	parser.add_argument('--server', default = None,
+		help = 'use a running pdf2eval service instead of a local worker, e.g. http://127.0.0.1:8765')
+	args = parser.parse_args()
 	try:
 		app = QtWidgets.QApplication([])
-		a_window = Window()
+		a_window = Window(args.server)
 		code = app.exec_()
 		if a_window.worker is not None:
 			a_window.send_worker_request(PdfWorker.TERMINATE_REQUEST)
@@ -0,0 +1,211 @@
+"""
+opt-in profiling of the local pipeline, enabled with the PDF2EVAL_PROFILE environment variable:
+	PDF2EVAL_PROFILE=spans      timing spans around the local hot paths
+	PDF2EVAL_PROFILE=cprofile   spans, plus a cProfile capture of every worker request
+	PDF2EVAL_PROFILE=sample     spans, plus a sampling profiler of threads serving a request
+
+after every worker request a report of that request's thread is written to
+PDF2EVAL_PROFILE_DIR (default ./profile):
+	<name>.txt             per-stage calls, total and self time, local CPU vs OpenAI API time
+	<name>.spans.folded    span stacks in collapsed format, for flamegraph.pl or speedscope
+	<name>.samples.folded  sampled Python stacks in collapsed format (sample mode)
+	<name>.prof            cProfile stats, for pstats or snakeviz (cprofile mode)
+
+time spent waiting for OpenAI is recorded in the API_STAGE span and time spent waiting
+for the rate limit in the RATE_LIMIT_STAGE span, so they can be told apart from local CPU time
+"""
+import cProfile
+import os
+import sys
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+SPANS = 'spans'
+CPROFILE = 'cprofile'
+SAMPLE = 'sample'
+
+API_STAGE = 'api'
+RATE_LIMIT_STAGE = 'rate_limit'
+WAIT_STAGES = [API_STAGE, RATE_LIMIT_STAGE] # not counted as local time
+
+MODE : str = os.environ.get('PDF2EVAL_PROFILE', '').lower()
+if MODE in ('1', 'true', 'on'):
+	MODE = SPANS
+enabled : bool = MODE in (SPANS, CPROFILE, SAMPLE)
+OUTPUT_DIR : str = os.environ.get('PDF2EVAL_PROFILE_DIR', './profile')
+SAMPLE_INTERVAL : float = 0.005
+
+_local = threading.local()
+_lock = threading.Lock()
+_active_threads : set[int] = set() # threads inside request(), the only ones sampled
+_sampler : threading.Thread | None = None
+_report_count : int = 0
+
+class _ThreadData(object):
+	"""
+	what was collected in one thread since its last report, so that concurrent
+	requests (e.g. the jobs of the local service) are reported separately
+	"""
+	__slots__ = ('span_stacks', 'stage_stats', 'samples')
+
+	def __init__(self):
+		self.span_stacks : dict[str, float] = defaultdict(float) # collapsed span stack -> self seconds
+		self.stage_stats : dict[str, list] = {} # span name -> [calls, total seconds, self seconds]
+		self.samples : dict[str, int] = defaultdict(int) # collapsed python stack -> number of samples
+
+_thread_data : dict[int, _ThreadData] = {} # thread ident -> data, guarded by _lock
+
+def _get_thread_data(ident : int) -> _ThreadData:
+	# caller holds _lock
+	data = _thread_data.get(ident)
+	if data is None:
+		data = _thread_data[ident] = _ThreadData()
+	return data
+
+class _Span(object):
+	__slots__ = ('name', 'start', 'child_time')
+
+	def __init__(self, name : str):
+		self.name : str = name
+
+	def __enter__(self):
+		stack = getattr(_local, 'stack', None)
+		if stack is None:
+			stack = _local.stack = []
+		stack.append(self)
+		self.child_time : float = 0.0
+		self.start : float = time.perf_counter()
+		return self
+
+	def __exit__(self, *exc):
+		elapsed = time.perf_counter() - self.start
+		stack = _local.stack
+		path = ';'.join(s.name for s in stack)
+		stack.pop()
+		if len(stack) > 0:
+			stack[-1].child_time += elapsed
+		self_time = elapsed - self.child_time
+		with _lock:
+			data = _get_thread_data(threading.get_ident())
+			data.span_stacks[path] += self_time
+			stats = data.stage_stats.setdefault(self.name, [0, 0.0, 0.0])
+			stats[0] += 1
+			stats[1] += elapsed
+			stats[2] += self_time
+		return False
+
+class _NullSpan(object):
+	__slots__ = ()
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *exc):
+		return False
+
+_NULL_SPAN = _NullSpan()
+
+def span(name : str):
+	"""
+	times the enclosed block as a stage of the pipeline, a no-op unless profiling is enabled
+	usage: with profiling.span('extract_text'): ...
+	"""
+	return _Span(name) if enabled else _NULL_SPAN
+
+def _sample_loop():
+	me = threading.get_ident()
+	while True:
+		time.sleep(SAMPLE_INTERVAL)
+		with _lock:
+			active = set(_active_threads)
+		for ident, frame in sys._current_frames().items():
+			if ident == me or ident not in active:
+				continue
+			stack = []
+			while frame is not None:
+				stack.append('{}:{}'.format(os.path.basename(frame.f_code.co_filename), frame.f_code.co_name))
+				frame = frame.f_back
+			with _lock:
+				_get_thread_data(ident).samples[';'.join(reversed(stack))] += 1
+
+def _start_sampler():
+	global _sampler
+	with _lock:
+		if _sampler is not None:
+			return
+		_sampler = threading.Thread(target = _sample_loop, name = 'pdf2eval-sampler', daemon = True)
+	_sampler.start()
+
+@contextmanager
+def request(name : str):
+	"""
+	profiles one worker request and writes its report when it ends
+	"""
+	if not enabled:
+		yield
+		return
+	profiler = None
+	if MODE == CPROFILE:
+		profiler = cProfile.Profile()
+	elif MODE == SAMPLE:
+		_start_sampler()
+	ident = threading.get_ident()
+	with _lock:
+		_thread_data.pop(ident, None) # the report only covers this request
+		_active_threads.add(ident)
+	try:
+		with _Span(name):
+			if profiler is not None:
+				profiler.enable()
+			try:
+				yield
+			finally:
+				if profiler is not None:
+					profiler.disable()
+	finally:
+		with _lock:
+			_active_threads.discard(ident)
+		write_report(name, profiler)
+
+def _write_folded(path : str, stacks : dict, scale : float):
+	with open(path, 'w', encoding = 'utf-8') as f:
+		for stack, value in sorted(stacks.items()):
+			count = int(round(value * scale))
+			if count > 0:
+				f.write('{} {}\n'.format(stack, count))
+
+def write_report(name : str, profiler : cProfile.Profile | None = None) -> str:
+	"""
+	writes the data collected in the calling thread since its last report and resets it
+	returns the common path prefix of the written files
+	"""
+	global _report_count
+	with _lock:
+		data = _thread_data.pop(threading.get_ident(), None) or _ThreadData()
+		stage_stats = data.stage_stats
+		span_stacks = data.span_stacks
+		samples = data.samples
+		_report_count += 1
+		base = os.path.join(OUTPUT_DIR, '{}-{:03d}-{}'.format(time.strftime('%Y%m%d-%H%M%S'), _report_count, name))
+	os.makedirs(OUTPUT_DIR, exist_ok = True)
+
+	total = sum(s[2] for s in stage_stats.values())
+	waits = [(stage, stage_stats.get(stage, [0, 0.0, 0.0])[2]) for stage in WAIT_STAGES]
+	with open(base + '.txt', 'w', encoding = 'utf-8') as f:
+		f.write('request: {}\n'.format(name))
+		f.write('local time: {:.1f} ms\n'.format((total - sum(t for _, t in waits)) * 1000))
+		f.write('waiting: {}\n\n'.format(', '.join('{} {:.1f} ms'.format(stage, t * 1000) for stage, t in waits)))
+		f.write('{:<20} {:>8} {:>12} {:>12} {:>12}\n'.format('stage', 'calls', 'total [ms]', 'self [ms]', 'mean [ms]'))
+		for stage, (calls, stage_total, stage_self) in sorted(stage_stats.items(), key = lambda x: -x[1][2]):
+			f.write('{:<20} {:>8} {:>12.1f} {:>12.1f} {:>12.3f}\n'.format(
+				stage, calls, stage_total * 1000, stage_self * 1000, stage_total * 1000 / calls))
+	# collapsed stacks are weighted in microseconds
+	_write_folded(base + '.spans.folded', span_stacks, 1e6)
+	if len(samples) > 0:
+		_write_folded(base + '.samples.folded', samples, 1)
+	if profiler is not None:
+		profiler.dump_stats(base + '.prof')
+	print('profile written to {}.*'.format(base))
+	return base
@@ -1,12 +1,84 @@
 import heapq
+import threading
+import time
 import typing
 
-import openai
-from tiktoken.core import Encoding
-from tiktoken.load import load_tiktoken_bpe
+import profiling
 
+# openai and tiktoken are slow to import, so they are only imported on first use
+if typing.TYPE_CHECKING:
+	from tiktoken.core import Encoding
+
+_api_key : str = ''
+_encoding : 'Encoding | None' = None
+_encoding_lock = threading.Lock()
+
+def set_api_key(key : str):
+	global _api_key
+	_api_key = key
+
+class RequestCancelled(Exception):
+	"""
+	raised by a prompt when the request of the thread dispatching it has been cancelled
+	discard is False if the request was only asked to stop early,
+	in which case results that were already received remain valid
+	"""
+	def __init__(self, discard : bool):
+		super().__init__('request cancelled')
+		self.discard : bool = discard
+
+_cancel_check = threading.local()
+
+def set_cancel_check(should_stop : typing.Callable[[], bool] | None,
+		should_discard : typing.Callable[[], bool] | None = None):
+	"""
+	sets the functions that the prompts of the calling thread poll around every request to OpenAI:
+	should_stop before sending a request, should_discard after a completion was received
+	(defaults to should_stop), they raise RequestCancelled once it returns True
+	"""
+	_cancel_check.should_stop = should_stop
+	_cancel_check.should_discard = should_discard or should_stop
+
+def check_cancelled():
+	should_stop = getattr(_cancel_check, 'should_stop', None)
+	if should_stop is not None and should_stop():
+		raise RequestCancelled(_cancel_check.should_discard())
+
+def check_discarded():
+	should_discard = getattr(_cancel_check, 'should_discard', None)
+	if should_discard is not None and should_discard():
+		raise RequestCancelled(True)
+
+class RateLimiter(object):
+	"""
+	spaces out requests to OpenAI so that at most requests_per_minute are sent,
+	shared by every prompt in the process
+	"""
+	def __init__(self, requests_per_minute : int = 0):
+		super().__init__()
+		self.lock = threading.Lock()
+		self.interval : float = 0.0
+		self.next_time : float = 0.0
+		self.set_rate(requests_per_minute)
+
+	def set_rate(self, requests_per_minute : int):
+		"""
+		0 disables rate limiting
+		"""
+		self.interval = 60.0 / requests_per_minute if requests_per_minute > 0 else 0.0
+
+	def wait(self):
+		with self.lock:
+			now = time.monotonic()
+			delay = self.next_time - now
+			self.next_time = max(now, self.next_time) + self.interval
+		if delay > 0:
+			time.sleep(delay)
+
+rate_limiter = RateLimiter()
 
 def cl100k_base():
+	from tiktoken.load import load_tiktoken_bpe
 	mergeable_ranks = load_tiktoken_bpe(
 		"https://openaipublic.blob.core.windows.net/encodings/cl100k_base.tiktoken"
 	)
@@ -29,6 +101,18 @@ def cl100k_base():
 		"special_tokens": special_tokens,
 	}
 
+def get_encoding() -> 'Encoding':
+	"""
+	returns the tokenizer shared by all prompts, loading it on first use
+	safe to call from a background thread to warm it up
+	"""
+	global _encoding
+	with _encoding_lock:
+		if _encoding is None:
+			from tiktoken.core import Encoding
+			_encoding = Encoding(**cl100k_base())
+		return _encoding
+
 
 class Message(object):
 	"""
@@ -59,23 +143,25 @@ class Message(object):
 		return self
 
 	def shorten(self) -> bool:
-		if len(self.non_important) > 0:
-			cnt, importance, time_stamp, text = heapq.heappop(self.non_important)
-			if cnt < 3: # just delete it if we have shortened it for too many num of times
-				text = self.prompt._summarize(text)
-				heapq.heappush(self.non_important, (cnt+1, importance, time_stamp, text))
-			return True
-		else:
-			return False
+		with profiling.span('shorten'):
+			if len(self.non_important) > 0:
+				cnt, importance, time_stamp, text = heapq.heappop(self.non_important)
+				if cnt < 3: # just delete it if we have shortened it for too many num of times
+					text = self.prompt._summarize(text)
+					heapq.heappush(self.non_important, (cnt+1, importance, time_stamp, text))
+				return True
+			else:
+				return False
 
 	def get_text(self) -> str:
-		texts = []
-		for (time, text) in self.important:
-			texts.append((time, text))
-		for (_, _, time, text) in self.non_important:
-			texts.append((time, text))
-		texts.sort()
-		return ''.join(t[1] for t in texts)
+		with profiling.span('get_text'):
+			texts = []
+			for (time_stamp, text) in self.important:
+				texts.append((time_stamp, text))
+			for (_, _, time_stamp, text) in self.non_important:
+				texts.append((time_stamp, text))
+			texts.sort()
+			return ''.join(t[1] for t in texts)
 	
 	def __repr__(self) -> str:
 		return self.get_text()
@@ -91,12 +177,16 @@ class Prompt(object):
 		self.limit : int = limit
 		# list of pairs of (role, message object)
 		self.messages : list[tuple[str, Message]] = []
-		self.encoding = Encoding(**cl100k_base())
+		self.encoding : 'Encoding' = get_encoding()
+		self.num_tokens_used : int = 0 # total tokens billed for requests made by this prompt
+		self.num_prompt_tokens : int = 0 # of which prompt tokens, billed once per request
 
 	def _get_num_tokens(self) -> int:
 		ret = 0
 		for _, msg in self.messages:
-			ret += len(self.encoding.encode(msg.get_text()))
+			text = msg.get_text()
+			with profiling.span('encode'):
+				ret += len(self.encoding.encode(text))
 		# print('cur num of tokens = {}'.format(ret))
 		# print(self.messages)
 		return ret
@@ -116,19 +206,33 @@ class Prompt(object):
 		return False
 
 	def _request(self, messages : list[dict[str,str]], num_tries : int = 10) -> str:
+		return self._request_choices(messages, 1, num_tries)[0]
+
+	def _request_choices(self, messages : list[dict[str,str]], n : int, num_tries : int = 10) -> list[str]:
+		import openai
+		openai.api_key = _api_key
 		for i in range(num_tries):
+			with profiling.span(profiling.RATE_LIMIT_STAGE):
+				rate_limiter.wait()
+			check_cancelled()
 			try:
-				completion = openai.ChatCompletion.create(
-					model = 'gpt-3.5-turbo', 
-					messages = messages
-				)
-				return completion['choices'][0]['message']['content']
+				with profiling.span(profiling.API_STAGE):
+					completion = openai.ChatCompletion.create(
+						model = 'gpt-3.5-turbo', 
+						messages = messages,
+						n = n
+					)
+				self.num_tokens_used += completion['usage']['total_tokens']
+				self.num_prompt_tokens += completion['usage']['prompt_tokens']
 			except BaseException as e:
 				if i == num_tries - 1:
 					raise e
 				else:
 					print("request to OpenAI failed, retrying ...")
 					continue
+			# the completion is stale if the request was superseded while it was in flight
+			check_discarded()
+			return [choice['message']['content'] for choice in completion['choices']]
 
 	def _summarize(self, text : str):
 		messages = [
@@ -144,6 +248,15 @@ class Prompt(object):
 		return self._request(messages)
 
 	def dispatch(self) -> str:
+		return self._request(self._build_messages())
+
+	def dispatch_n(self, n : int) -> list[str]:
+		"""
+		requests n alternative completions of the prompt in a single call
+		"""
+		return self._request_choices(self._build_messages(), n)
+
+	def _build_messages(self) -> list[dict[str,str]]:
 		# make sure we stay within token limit
 		while self._get_num_tokens() > self.limit:
 			shortened = False
@@ -158,7 +271,7 @@ class Prompt(object):
 		for role, msg in self.messages:
 			message.append({ "role" : role, "content" : msg.get_text() })
 		# print('final message {}:\n'.format(message))
-		return self._request(message)
+		return message
 
 def unit_test():
 	p = Prompt(50)
@@ -0,0 +1,72 @@
+import threading
+import typing
+from collections import deque
+
+
+class RequestQueue(object):
+	"""
+	the request queue of a worker, items are (request type, args) like with queue.Queue
+	- a request of a coalesce type is dropped if the same request is pending or being served
+	- a request of a supersede type drops every pending request and cancels the one being served,
+	  whose results are discarded
+	- any request preempts idle work done while nothing is being served, which stops before
+	  its next API call but keeps the results it already received
+	the worker polls should_stop() and should_discard(), and calls task_done() after each request
+	on_supersede, if given, is called by put() when it cancels the request being served,
+	for workers that cannot poll while they wait, e.g. on a remote service
+	"""
+	def __init__(self, coalesce : set[int], supersede : set[int],
+			on_supersede : typing.Callable[[], None] | None = None):
+		super().__init__()
+		self.coalesce : set[int] = coalesce
+		self.supersede : set[int] = supersede
+		self.on_supersede = on_supersede
+		self.pending : deque[tuple[int, tuple]] = deque()
+		self.current : tuple[int, tuple] | None = None
+		self.cancelled : bool = False # superseded
+		self.preempted : bool = False # idle work should yield
+		self.cond = threading.Condition()
+
+	def put(self, item : tuple[int, tuple]) -> bool:
+		"""
+		returns False if the request was coalesced with an identical one
+		"""
+		type, _ = item
+		superseded = False
+		with self.cond:
+			if type in self.supersede:
+				self.pending.clear()
+				self.cancelled = True
+				superseded = self.current is not None
+			elif type in self.coalesce and (item == self.current or item in self.pending):
+				return False
+			elif self.current is None:
+				self.preempted = True
+			self.pending.append(item)
+			self.cond.notify()
+		if superseded and self.on_supersede is not None:
+			self.on_supersede()
+		return True
+
+	def get(self) -> tuple[int, tuple]:
+		with self.cond:
+			while len(self.pending) == 0:
+				self.cond.wait()
+			self.current = self.pending.popleft()
+			self.cancelled = self.preempted = False
+			return self.current
+
+	def task_done(self):
+		with self.cond:
+			self.current = None
+			self.cancelled = self.preempted = False
+
+	def empty(self) -> bool:
+		with self.cond:
+			return len(self.pending) == 0
+
+	def should_stop(self) -> bool:
+		return self.cancelled or self.preempted
+
+	def should_discard(self) -> bool:
+		return self.cancelled
@@ -0,0 +1,143 @@
+import math
+import re
+from array import array
+from collections import Counter
+from typing import Callable
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+STOP_WORDS = frozenset([
+	"a", "about", "above", "after", "all", "also", "an", "and", "any", "are", "as", "at",
+	"be", "been", "being", "both", "but", "by", "can", "could", "did", "do", "does",
+	"each", "for", "from", "had", "has", "have", "how", "if", "in", "into", "is", "it",
+	"its", "may", "might", "more", "most", "not", "of", "on", "one", "or", "other",
+	"our", "over", "so", "such", "than", "that", "the", "their", "them", "then", "there",
+	"these", "they", "this", "those", "through", "to", "two", "under", "up", "was", "we",
+	"were", "what", "when", "where", "which", "while", "who", "why", "will", "with",
+	"would", "you", "your",
+])
+
+def tokenize(text : str) -> list[str]:
+	"""
+	lower-cases the text and splits it into alphanumeric terms, dropping stop words
+	"""
+	return [t for t in TOKEN_PATTERN.findall(text.lower()) if t not in STOP_WORDS and len(t) > 1]
+
+def estimate_num_tokens(text : str) -> int:
+	"""
+	cheap offline estimate of the number of BPE tokens (about 4 characters per token)
+	"""
+	return len(text) // 4 + 1
+
+def split_passages(pages : list[str], max_words : int = 120) -> list[tuple[int, str]]:
+	"""
+	splits page texts into passages of at most max_words words
+	returns a list of (page index, passage text)
+	"""
+	passages = []
+	for i, page in enumerate(pages):
+		words = page.split()
+		for start in range(0, len(words), max_words):
+			passages.append((i, ' '.join(words[start : start + max_words])))
+	return passages
+
+class BM25Index(object):
+	"""
+	an in-memory Okapi BM25 index over a list of passages
+	postings are stored in compressed-sparse-row form using flat typed arrays
+	"""
+	def __init__(self, passages : list[tuple[int, str]], k1 : float = 1.5, b : float = 0.75):
+		super().__init__()
+		self.k1 : float = k1
+		self.b : float = b
+		self.passages : list[tuple[int, str]] = passages
+		self.vocab : dict[str, int] = {}
+
+		# term id -> list of (passage id, term frequency), flattened below
+		postings : list[list[tuple[int, int]]] = []
+		self.doc_len = array('I')
+		for doc_id, (_, text) in enumerate(passages):
+			terms = tokenize(text)
+			self.doc_len.append(len(terms))
+			for term, tf in Counter(terms).items():
+				term_id = self.vocab.setdefault(term, len(postings))
+				if term_id == len(postings):
+					postings.append([])
+				postings[term_id].append((doc_id, tf))
+
+		self.offsets = array('I', [0])
+		self.doc_ids = array('I')
+		self.tfs = array('H')
+		self.idf = array('f')
+		num_docs = len(passages)
+		for plist in postings:
+			for doc_id, tf in plist:
+				self.doc_ids.append(doc_id)
+				self.tfs.append(min(tf, 0xFFFF))
+			self.offsets.append(len(self.doc_ids))
+			df = len(plist)
+			self.idf.append(math.log(1 + (num_docs - df + 0.5) / (df + 0.5)))
+		self.avg_doc_len : float = sum(self.doc_len) / num_docs if num_docs > 0 else 0.0
+
+	def __len__(self) -> int:
+		return len(self.passages)
+
+	def top_terms(self, text : str, n : int) -> list[str]:
+		"""
+		returns the n indexed terms of the text with the highest tf-idf, i.e. the most specific ones
+		"""
+		counts = Counter(t for t in tokenize(text) if t in self.vocab)
+		return sorted(counts, key = lambda t: -counts[t] * self.idf[self.vocab[t]])[:n]
+
+	def search(self, query : str | dict[str, float], top_k : int) -> list[tuple[int, float]]:
+		"""
+		returns up to top_k (passage id, score) pairs, best first
+		the query is either a text or a dict of term -> weight
+		"""
+		if len(self.passages) == 0:
+			return []
+		terms = query if isinstance(query, dict) else Counter(tokenize(query))
+		scores = [0.0] * len(self.passages)
+		for term, qtf in terms.items():
+			term_id = self.vocab.get(term)
+			if term_id is None:
+				continue
+			idf = self.idf[term_id]
+			for j in range(self.offsets[term_id], self.offsets[term_id + 1]):
+				doc_id, tf = self.doc_ids[j], self.tfs[j]
+				norm = self.k1 * (1 - self.b + self.b * self.doc_len[doc_id] / self.avg_doc_len)
+				# repeated query terms count once per occurrence, like a longer query
+				scores[doc_id] += qtf * idf * tf * (self.k1 + 1) / (tf + norm)
+		ranked = sorted((i for i, s in enumerate(scores) if s > 0), key = lambda i: -scores[i])
+		return [(i, scores[i]) for i in ranked[:top_k]]
+
+	def retrieve(self, query : str | dict[str, float], top_k : int, token_budget : int,
+			count_tokens : Callable[[str], int] = estimate_num_tokens) -> list[str]:
+		"""
+		returns the text of the best passages for the query, at most top_k of them,
+		stopping before the total number of tokens exceeds token_budget.
+		passages are returned in document order so the context reads naturally
+		"""
+		chosen = []
+		used = 0
+		for doc_id, _ in self.search(query, top_k):
+			text = '(page {}) {}'.format(self.passages[doc_id][0] + 1, self.passages[doc_id][1])
+			cost = count_tokens(text)
+			if used + cost > token_budget:
+				continue
+			chosen.append((doc_id, text))
+			used += cost
+		chosen.sort()
+		return [text for _, text in chosen]
+
+def unit_test():
+	pages = [
+		"Gaussian splatting renders a scene as a set of anisotropic gaussians.",
+		"We train the gaussians with a differentiable rasterizer and adaptive density control.",
+		"Related work includes neural radiance fields which are slow to render.",
+	]
+	index = BM25Index(split_passages(pages, 8))
+	print(index.search("how are the gaussians rendered and trained", 3))
+	print(index.retrieve("differentiable rasterizer", 2, 100))
+if __name__ == "__main__":
+	unit_test()
@@ -0,0 +1,525 @@
+"""
+local HTTP service mode: python pdf2eval.py serve [--host HOST] [--port PORT] [--rpm N]
+
+all clients share one process, so the tokenizer is loaded once, every request to
+OpenAI goes through one rate limiter and finished runs in the results store are
+served again instead of being recomputed
+
+API (all bodies are JSON with Content-Type: application/json unless noted):
+	POST   /jobs                  submit a job, either {"path": ..., "params": {...}}
+	                              or a raw PDF body with Content-Type: application/pdf,
+	                              in which case params are given in the query string
+	                              (?name=paper.pdf&qa_algorithm=2) and force=1 skips the cache
+	GET    /jobs                  list jobs
+	GET    /jobs/<id>             job status and progress
+	GET    /jobs/<id>/events      progress as server-sent events until the job is idle,
+	                              ?since=N skips the first N events
+	GET    /jobs/<id>/result      latest sections, ?format=plain for the plain-text export
+	POST   /jobs/<id>/redo        {"section": "SUMMARY"} rewrites one section, a job served
+	                              from the results store continues the stored run
+	DELETE /jobs/<id>             stops the worker of a job
+"""
+import argparse
+import io
+import json
+import os
+import tempfile
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from PyQt5.QtCore import QCoreApplication, Qt
+
+import config
+import prompt
+from pdf2eval import GenerationParams, PdfWorker, get_result_types, warm_up
+from store import ResultStore, hash_file
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+IDLE_TIMEOUT = 600 # seconds a job stays idle before its worker is stopped
+MAX_JOBS = 100 # idle jobs beyond this are forgotten, least recently active first
+RETIRE_INTERVAL = 30 # seconds between checks for idle jobs
+
+class BadRequest(Exception):
+	"""
+	invalid input from a client, answered with the status (400 by default) and the message
+	"""
+	def __init__(self, msg : str, status : int = 400):
+		super().__init__(msg)
+		self.status : int = status
+
+def get_int(d : dict, name : str, default : int, choices : type | None = None) -> int:
+	"""
+	reads an integer field of a request, choices is a class of int constants like config.QAAlgorithm
+	"""
+	value = d.get(name, default)
+	try:
+		# int() alone would take true as 1 and truncate 1.7 to 1
+		if isinstance(value, bool) or (isinstance(value, float) and not value.is_integer()):
+			raise ValueError(value)
+		ret = int(value)
+	except (TypeError, ValueError):
+		raise BadRequest('{} must be an integer, got {}'.format(name, json.dumps(value)))
+	if choices is not None and ret not in [v for k, v in vars(choices).items() if not k.startswith('__')]:
+		raise BadRequest('unknown {}: {}'.format(name, ret))
+	return ret
+
+def params_from_dict(d : dict) -> GenerationParams:
+	if not isinstance(d, dict):
+		raise BadRequest('params must be an object')
+	params = GenerationParams()
+	params.summary_algorithm = get_int(d, 'summary_algorithm', params.summary_algorithm, config.SummaryAlgorithm)
+	params.qa_algorithm = get_int(d, 'qa_algorithm', params.qa_algorithm, config.QAAlgorithm)
+	params.writing_sample = d.get('writing_sample', params.writing_sample)
+	if not isinstance(params.writing_sample, str):
+		raise BadRequest('writing_sample must be a string')
+	return params
+
+class Job(object):
+	RUNNING = 'running'
+	DONE = 'done'
+	FAILED = 'failed'
+	STOPPED = 'stopped'
+
+	def __init__(self, id : str, pdf_path : str, params : GenerationParams):
+		super().__init__()
+		self.id : str = id
+		self.pdf_path : str = pdf_path
+		self.params : GenerationParams = params
+		self.worker : PdfWorker | None = None # None for jobs served from the results store until redone
+		self.run_id : int | None = None
+		self.status : str = Job.RUNNING
+		self.message : str = ''
+		self.progress : int = 0
+		self.total : int = 0
+		self.events : list[dict] = []
+		self.last_active : float = time.monotonic()
+		self.retired : list[PdfWorker] = [] # workers of an idle job that are still shutting down
+		self.cond = threading.Condition()
+
+	def to_dict(self) -> dict:
+		return {
+			'id' : self.id,
+			'pdf' : os.path.basename(self.pdf_path),
+			'run_id' : self.run_id,
+			'status' : self.status,
+			'message' : self.message,
+			'progress' : self.progress,
+			'total' : self.total,
+		}
+
+	def _push_event(self):
+		# caller holds self.cond
+		self.events.append(self.to_dict())
+		self.cond.notify_all()
+
+	def _start_worker(self):
+		# results are only served from the store, the shared out.txt is left to the clients
+		worker = PdfWorker(None, self.pdf_path, self.params, export_plain = False)
+		# direct connections: the slots run in the worker thread, no event loop is needed
+		worker.progress_signal.connect(self.on_progress, Qt.DirectConnection)
+		worker.finished.connect(lambda: self.on_finished(worker), Qt.DirectConnection)
+		self.worker = worker
+		worker.start()
+
+	def start(self):
+		with self.cond:
+			self._start_worker()
+			self.request(PdfWorker.PROCESS_REQUEST)
+
+	def redo(self, redo_type : int) -> bool:
+		"""
+		returns False if the job was stopped or has no run to redo a section of
+		"""
+		with self.cond:
+			if self.status == Job.STOPPED or self.run_id is None:
+				return False
+			if self.worker is None:
+				# served from the results store or retired, the stored run is continued by a new worker
+				self._start_worker()
+				self.request(PdfWorker.RESUME_REQUEST, self.run_id)
+			self.request(PdfWorker.REDO_REQUEST, redo_type)
+			return True
+
+	def request(self, type : int, *args):
+		with self.cond:
+			# a request coalesced with a pending or running one does not change the job state
+			if not self.worker.request_queue.put((type, args)):
+				return
+			self.status = Job.RUNNING
+			self.message, self.progress, self.total = '', 0, 0
+			self.last_active = time.monotonic()
+			self._push_event()
+
+	def on_progress(self, msg : str, value : int, total : int):
+		with self.cond:
+			if self.worker.result is not None:
+				self.run_id = self.worker.result.run_id
+			self.message, self.progress, self.total = msg, value, total
+			self.last_active = time.monotonic()
+			if value == total:
+				# the request being served is finished, the job is idle unless more are queued
+				self.status = Job.RUNNING if not self.worker.request_queue.empty() else Job.DONE
+			self._push_event()
+
+	def on_finished(self, worker : PdfWorker):
+		with self.cond:
+			if worker in self.retired:
+				self.retired.remove(worker)
+				return
+			if self.status != Job.STOPPED:
+				self.status = Job.FAILED
+				self.message = 'worker exited unexpectedly'
+			self.worker = None
+			self._push_event()
+
+	def stop(self):
+		with self.cond:
+			worker = self.worker
+			if self.status == Job.STOPPED:
+				return
+			self.status = Job.STOPPED
+			self._push_event() # ends the event streams
+		if worker is not None:
+			worker.request_queue.put((PdfWorker.TERMINATE_REQUEST, ()))
+
+	def retire(self) -> bool:
+		"""
+		stops the worker of an idle job to free its thread and connection
+		the job keeps its results, and a later redo continues the run in a new worker
+		returns False if the job is not idle
+		"""
+		with self.cond:
+			if self.worker is None or self.status != Job.DONE:
+				return False
+			self.retired.append(self.worker)
+			self.worker.request_queue.put((PdfWorker.TERMINATE_REQUEST, ()))
+			self.worker = None
+			return True
+
+	def workers(self) -> list[PdfWorker]:
+		"""
+		returns the workers of the job that may still be running
+		"""
+		with self.cond:
+			return self.retired + ([self.worker] if self.worker is not None else [])
+
+	def is_busy(self) -> bool:
+		"""
+		True while the worker is serving a request or has one queued
+		"""
+		return self.status == Job.RUNNING
+
+class Service(object):
+	"""
+	owns the jobs and their workers, shared by all request handler threads
+	"""
+	def __init__(self, upload_dir : str):
+		super().__init__()
+		self.upload_dir : str = upload_dir
+		self.jobs : dict[str, Job] = {}
+		self.lock = threading.Lock()
+		self.stopping = threading.Event()
+		self.retire_thread = threading.Thread(target = self._retire_loop, daemon = True)
+		self.retire_thread.start()
+
+	def submit(self, pdf_path : str, params : GenerationParams, force : bool = False) -> Job:
+		job = Job(uuid.uuid4().hex[:12], pdf_path, params)
+		with self.lock:
+			self.jobs[job.id] = job
+		if not force and self._load_cached(job):
+			return job
+		job.start()
+		return job
+
+	def _load_cached(self, job : Job) -> bool:
+		"""
+		reuses the latest complete run of the same PDF with the same params, if any
+		"""
+		store = ResultStore(config.RESULTS_DB)
+		try:
+			for run in store.find_runs(hash_file(job.pdf_path), job.params.to_dict(), limit = 1):
+				if len(store.get_sections(run['id'])) == len(get_result_types()):
+					with job.cond:
+						job.run_id = run['id']
+						job.status = Job.DONE
+						job.message = 'loaded from results store'
+						job._push_event()
+					return True
+			return False
+		finally:
+			store.close()
+
+	def _retire_loop(self):
+		while not self.stopping.wait(RETIRE_INTERVAL):
+			self.retire_idle()
+
+	def retire_idle(self):
+		"""
+		stops the workers of jobs idle for longer than IDLE_TIMEOUT, and once there are more
+		than MAX_JOBS jobs, stops and forgets the least recently active idle ones
+		"""
+		now = time.monotonic()
+		jobs = sorted(self.all_jobs(), key = lambda job: job.last_active)
+		excess = len(jobs) - MAX_JOBS
+		forget = []
+		for job in jobs:
+			if job.is_busy():
+				continue
+			if excess > 0:
+				# stopped first so that no redo starts a worker for it, and only
+				# forgotten once its worker has exited
+				job.stop()
+				if len(job.workers()) == 0:
+					forget.append(job)
+				excess -= 1
+			elif now - job.last_active > IDLE_TIMEOUT:
+				job.retire()
+		with self.lock:
+			for job in forget:
+				del self.jobs[job.id]
+			in_use = set(job.pdf_path for job in self.jobs.values())
+		for pdf_path in set(job.pdf_path for job in forget) - in_use:
+			if os.path.dirname(pdf_path) == self.upload_dir and os.path.exists(pdf_path):
+				os.remove(pdf_path)
+
+	def get(self, id : str) -> Job | None:
+		with self.lock:
+			return self.jobs.get(id)
+
+	def all_jobs(self) -> list[Job]:
+		with self.lock:
+			return list(self.jobs.values())
+
+	def shutdown(self):
+		self.stopping.set()
+		self.retire_thread.join()
+		for job in self.all_jobs():
+			job.stop()
+		for job in self.all_jobs():
+			for worker in job.workers():
+				worker.wait()
+
+class RequestHandler(BaseHTTPRequestHandler):
+	service : Service = None # set by main()
+
+	def _send_json(self, obj, status : int = 200):
+		body = json.dumps(obj).encode('utf-8')
+		self.send_response(status)
+		self.send_header('Content-Type', 'application/json')
+		self.send_header('Content-Length', str(len(body)))
+		self.end_headers()
+		self.wfile.write(body)
+
+	def _send_error(self, status : int, msg : str):
+		self._send_json({ 'error' : msg }, status)
+
+	def _read_body(self) -> bytes:
+		return self.rfile.read(get_int(self.headers, 'Content-Length', 0))
+
+	def _read_json(self) -> dict:
+		"""
+		reads a JSON object body, an empty body is an empty object
+		the content type is required so that web pages cannot post without a CORS preflight
+		"""
+		if self.headers.get('Content-Type', '').split(';')[0].strip() != 'application/json':
+			raise BadRequest('expected Content-Type: application/json', 415)
+		body = self._read_body()
+		try:
+			ret = json.loads(body) if body else {}
+		except ValueError:
+			raise BadRequest('expected a JSON body')
+		if not isinstance(ret, dict):
+			raise BadRequest('expected a JSON object')
+		return ret
+
+	def _handle(self, handler):
+		try:
+			handler()
+		except BadRequest as e:
+			self._send_error(e.status, str(e))
+
+	def _check_origin(self):
+		# browsers send the Origin of cross-site requests, only pages of this service may change jobs
+		origin = self.headers.get('Origin')
+		if origin is not None and urlparse(origin).netloc != self.headers.get('Host'):
+			raise BadRequest('requests from {} are not allowed'.format(origin), 403)
+
+	def _route(self) -> tuple[list[str], dict[str, str]]:
+		url = urlparse(self.path)
+		parts = [p for p in url.path.split('/') if p]
+		query = { k : v[-1] for k, v in parse_qs(url.query).items() }
+		return parts, query
+
+	def _get_job(self, parts : list[str]) -> Job | None:
+		job = self.service.get(parts[1]) if len(parts) > 1 else None
+		if job is None:
+			self._send_error(404, 'unknown job')
+		return job
+
+	def do_GET(self):
+		self._handle(self._get)
+
+	def do_POST(self):
+		self._handle(self._post)
+
+	def do_DELETE(self):
+		self._handle(self._delete)
+
+	def _get(self):
+		parts, query = self._route()
+		if parts == ['jobs']:
+			self._send_json([job.to_dict() for job in self.service.all_jobs()])
+		elif len(parts) == 2 and parts[0] == 'jobs':
+			job = self._get_job(parts)
+			if job is not None:
+				self._send_json(job.to_dict())
+		elif len(parts) == 3 and parts[0] == 'jobs' and parts[2] == 'events':
+			job = self._get_job(parts)
+			if job is not None:
+				since = get_int(query, 'since', 0)
+				if since < 0:
+					raise BadRequest('since must not be negative')
+				self._send_events(job, since)
+		elif len(parts) == 3 and parts[0] == 'jobs' and parts[2] == 'result':
+			job = self._get_job(parts)
+			if job is not None:
+				self._send_result(job, query.get('format', 'json'))
+		else:
+			self._send_error(404, 'not found')
+
+	def _post(self):
+		self._check_origin()
+		parts, query = self._route()
+		if parts == ['jobs']:
+			self._submit(query)
+		elif len(parts) == 3 and parts[0] == 'jobs' and parts[2] == 'redo':
+			job = self._get_job(parts)
+			if job is None:
+				return
+			section = self._read_json().get('section')
+			if section not in get_result_types():
+				raise BadRequest('unknown section: {}'.format(section))
+			since = len(job.events)
+			if job.redo(get_result_types().index(section)):
+				self._send_json({ 'id' : job.id, 'since' : since }, 202)
+			else:
+				self._send_error(409, 'job was stopped or has no results, submit it again')
+		else:
+			self._send_error(404, 'not found')
+
+	def _delete(self):
+		self._check_origin()
+		parts, _ = self._route()
+		if len(parts) == 2 and parts[0] == 'jobs':
+			job = self._get_job(parts)
+			if job is not None:
+				job.stop()
+				self._send_json(job.to_dict())
+		else:
+			self._send_error(404, 'not found')
+
+	def _submit(self, query : dict[str, str]):
+		if self.headers.get('Content-Type', '').startswith('application/pdf'):
+			body = self._read_body()
+			params = params_from_dict(query)
+			force = query.get('force', '0') == '1'
+			name = os.path.basename(query.get('name', 'upload.pdf'))
+			pdf_path = os.path.join(self.service.upload_dir, uuid.uuid4().hex[:8] + '-' + name)
+			with open(pdf_path, 'wb') as f:
+				f.write(body)
+		else:
+			req = self._read_json()
+			pdf_path = req.get('path', '')
+			params = params_from_dict(req.get('params', {}))
+			force = bool(req.get('force', False))
+			if not isinstance(pdf_path, str):
+				raise BadRequest('path must be a string')
+		if not os.path.isfile(pdf_path):
+			raise BadRequest('file not found: {}'.format(pdf_path))
+		job = self.service.submit(pdf_path, params, force)
+		self._send_json(job.to_dict(), 201)
+
+	def _send_events(self, job : Job, since : int):
+		self.send_response(200)
+		self.send_header('Content-Type', 'text/event-stream')
+		self.send_header('Cache-Control', 'no-cache')
+		self.end_headers()
+		seen = since
+		while True:
+			with job.cond:
+				while len(job.events) <= seen and job.is_busy():
+					job.cond.wait(timeout = 15)
+				events = job.events[seen:]
+				seen = len(job.events)
+				busy = job.is_busy()
+			try:
+				if len(events) == 0:
+					self.wfile.write(b': keep-alive\n\n') # comment line, ignored by clients
+				for event in events:
+					self.wfile.write('data: {}\n\n'.format(json.dumps(event)).encode('utf-8'))
+				self.wfile.flush()
+			except (BrokenPipeError, ConnectionResetError):
+				return
+			if not busy:
+				return
+
+	def _send_result(self, job : Job, format : str):
+		if job.run_id is None:
+			self._send_error(409, 'job has no results yet')
+			return
+		store = ResultStore(config.RESULTS_DB)
+		try:
+			if format == 'plain':
+				text = io.StringIO()
+				store.export_plain(job.run_id, text)
+				body = text.getvalue().encode('utf-8')
+				self.send_response(200)
+				self.send_header('Content-Type', 'text/plain; charset=utf-8')
+				self.send_header('Content-Length', str(len(body)))
+				self.end_headers()
+				self.wfile.write(body)
+			else:
+				self._send_json(store.export_json(job.run_id))
+		finally:
+			store.close()
+
+	def log_message(self, format, *args):
+		pass
+
+def main(argv : list[str] | None = None) -> int:
+	parser = argparse.ArgumentParser(prog = 'pdf2eval serve', description = 'serve pdf2eval over local HTTP')
+	parser.add_argument('--host', default = DEFAULT_HOST)
+	parser.add_argument('--port', type = int, default = DEFAULT_PORT)
+	parser.add_argument('--rpm', type = int, default = config.get(config.RATE_LIMIT_RPM, config.DEFAULT_RATE_LIMIT_RPM),
+		help = 'maximum requests per minute to OpenAI shared by all jobs, 0 for unlimited')
+	parser.add_argument('--api-key', default = None, help = 'defaults to the key last entered in the GUI')
+	args = parser.parse_args(argv)
+
+	app = QCoreApplication.instance() or QCoreApplication([]) # workers are QThreads and need one
+	prompt.set_api_key(args.api_key or config.load_last_api_key() or '')
+	prompt.rate_limiter.set_rate(args.rpm)
+	threading.Thread(target = warm_up, daemon = True).start()
+
+	with tempfile.TemporaryDirectory(prefix = 'pdf2eval-') as upload_dir:
+		service = Service(upload_dir)
+		RequestHandler.service = service
+		httpd = ThreadingHTTPServer((args.host, args.port), RequestHandler)
+		httpd.daemon_threads = True
+		print('pdf2eval serving on http://{}:{}'.format(args.host, args.port))
+		try:
+			httpd.serve_forever()
+		except KeyboardInterrupt:
+			pass
+		finally:
+			httpd.server_close()
+			service.shutdown()
+	del app # only once every worker has exited
+	return 0
+
+if __name__ == "__main__":
+	import sys
+	sys.exit(main())
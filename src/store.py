@@ -0,0 +1,208 @@
+import argparse
+import hashlib
+import json
+import sqlite3
+import sys
+import time
+import typing
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+	id INTEGER PRIMARY KEY,
+	pdf_hash TEXT NOT NULL,
+	pdf_name TEXT NOT NULL,
+	params TEXT NOT NULL,
+	created REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS runs_by_hash ON runs (pdf_hash, params, created);
+CREATE INDEX IF NOT EXISTS runs_by_time ON runs (created);
+CREATE TABLE IF NOT EXISTS sections (
+	run_id INTEGER NOT NULL REFERENCES runs (id),
+	section TEXT NOT NULL,
+	version INTEGER NOT NULL,
+	text TEXT NOT NULL,
+	created REAL NOT NULL,
+	PRIMARY KEY (run_id, section, version)
+);
+CREATE TABLE IF NOT EXISTS pages (
+	run_id INTEGER NOT NULL REFERENCES runs (id),
+	page INTEGER NOT NULL,
+	text TEXT NOT NULL,
+	summary TEXT NOT NULL,
+	PRIMARY KEY (run_id, page)
+);
+CREATE TABLE IF NOT EXISTS speculation (
+	run_id INTEGER PRIMARY KEY REFERENCES runs (id),
+	tokens INTEGER NOT NULL
+);
+"""
+
+def hash_file(path : str) -> str:
+	"""
+	returns the sha256 of a file, used to recognize the same paper under different names
+	"""
+	h = hashlib.sha256()
+	with open(path, 'rb') as f:
+		for block in iter(lambda: f.read(1 << 16), b''):
+			h.update(block)
+	return h.hexdigest()
+
+def write_plain(sections : dict[str, str], file : typing.TextIO):
+	for _, text in sections.items():
+		file.write(text)
+		file.write('\n')
+		file.write('-' * 20)
+		file.write('\n')
+
+class ResultStore(object):
+	"""
+	a local SQLite store of evaluation results
+	every run of the pipeline on a PDF is a row keyed by PDF hash, params and time,
+	and every write of a section adds a new version so that redo history is kept
+	a store must only be used from the thread that created it
+	"""
+	def __init__(self, path : str):
+		super().__init__()
+		self.conn = sqlite3.connect(path)
+		self.conn.execute('PRAGMA journal_mode = WAL')
+		self.conn.executescript(SCHEMA)
+
+	def close(self):
+		self.conn.close()
+
+	def start_run(self, pdf_hash : str, pdf_name : str, params : dict) -> int:
+		with self.conn:
+			cur = self.conn.execute('INSERT INTO runs (pdf_hash, pdf_name, params, created) VALUES (?, ?, ?, ?)',
+				(pdf_hash, pdf_name, json.dumps(params, sort_keys = True), time.time()))
+		return cur.lastrowid
+
+	def put_section(self, run_id : int, section : str, text : str) -> int:
+		"""
+		stores a new version of a section, returns its version number
+		"""
+		with self.conn:
+			version, = self.conn.execute('SELECT COALESCE(MAX(version), 0) + 1 FROM sections WHERE run_id = ? AND section = ?',
+				(run_id, section)).fetchone()
+			self.conn.execute('INSERT INTO sections (run_id, section, version, text, created) VALUES (?, ?, ?, ?, ?)',
+				(run_id, section, version, text, time.time()))
+		return version
+
+	def put_pages(self, run_id : int, texts : list[str], summaries : list[str]):
+		"""
+		stores the extracted text and the summary of every page, so that a run can be resumed
+		"""
+		with self.conn:
+			self.conn.executemany('INSERT OR REPLACE INTO pages (run_id, page, text, summary) VALUES (?, ?, ?, ?)',
+				[(run_id, i, text, summary) for i, (text, summary) in enumerate(zip(texts, summaries))])
+
+	def get_pages(self, run_id : int) -> list[tuple[str, str]]:
+		"""
+		returns the (text, summary) of every page of a run, empty for runs stored without them
+		"""
+		return self.conn.execute('SELECT text, summary FROM pages WHERE run_id = ? ORDER BY page', (run_id,)).fetchall()
+
+	def add_speculative_tokens(self, run_id : int, tokens : int):
+		"""
+		adds to the tokens spent on drafts of a run, which are capped per run
+		"""
+		with self.conn:
+			self.conn.execute("""INSERT INTO speculation (run_id, tokens) VALUES (?, ?)
+				ON CONFLICT (run_id) DO UPDATE SET tokens = tokens + excluded.tokens""", (run_id, tokens))
+
+	def get_speculative_tokens(self, run_id : int) -> int:
+		rows = self.conn.execute('SELECT tokens FROM speculation WHERE run_id = ?', (run_id,)).fetchall()
+		return rows[0][0] if len(rows) > 0 else 0
+
+	def get_sections(self, run_id : int) -> dict[str, str]:
+		"""
+		returns the latest version of every section of a run, in the order they were first written
+		"""
+		rows = self.conn.execute("""
+			SELECT s.section, s.text FROM sections s
+			JOIN (SELECT section, MAX(version) AS version, MIN(rowid) AS first FROM sections
+				WHERE run_id = ? GROUP BY section) latest
+			ON s.section = latest.section AND s.version = latest.version
+			WHERE s.run_id = ? ORDER BY latest.first""", (run_id, run_id))
+		return dict(rows.fetchall())
+
+	def get_history(self, run_id : int, section : str) -> list[tuple[int, float, str]]:
+		"""
+		returns every (version, time, text) of a section, oldest first
+		"""
+		return self.conn.execute('SELECT version, created, text FROM sections WHERE run_id = ? AND section = ? ORDER BY version',
+			(run_id, section)).fetchall()
+
+	def find_runs(self, pdf_hash : str | None = None, params : dict | None = None, limit : int = 100) -> list[dict]:
+		"""
+		returns the most recent runs, optionally only those of a PDF and/or generated with given params
+		"""
+		query = 'SELECT id, pdf_hash, pdf_name, params, created FROM runs'
+		conditions, args = [], []
+		if pdf_hash is not None:
+			conditions.append('pdf_hash = ?')
+			args.append(pdf_hash)
+		if params is not None:
+			conditions.append('params = ?')
+			args.append(json.dumps(params, sort_keys = True))
+		if len(conditions) > 0:
+			query += ' WHERE ' + ' AND '.join(conditions)
+		query += ' ORDER BY created DESC LIMIT ?'
+		args.append(limit)
+		return [
+			{ 'id' : id, 'pdf_hash' : h, 'pdf_name' : name, 'params' : json.loads(p), 'created' : created }
+			for id, h, name, p, created in self.conn.execute(query, args)
+		]
+
+	def export_plain(self, run_id : int, file : typing.TextIO):
+		write_plain(self.get_sections(run_id), file)
+
+	def export_json(self, run_id : int) -> dict:
+		rows = self.conn.execute('SELECT pdf_hash, pdf_name, params, created FROM runs WHERE id = ?', (run_id,)).fetchall()
+		if len(rows) == 0:
+			raise RuntimeError('unknown run: {}'.format(run_id))
+		pdf_hash, pdf_name, params, created = rows[0]
+		return {
+			'id' : run_id,
+			'pdf_hash' : pdf_hash,
+			'pdf_name' : pdf_name,
+			'params' : json.loads(params),
+			'created' : created,
+			'sections' : self.get_sections(run_id),
+		}
+
+def main():
+	import config
+
+	parser = argparse.ArgumentParser(description = 'look up and export stored evaluations')
+	parser.add_argument('--db', default = config.RESULTS_DB)
+	commands = parser.add_subparsers(dest = 'command', required = True)
+	list_cmd = commands.add_parser('list', help = 'list recent runs')
+	list_cmd.add_argument('--pdf', default = None, help = 'only runs of this PDF file')
+	list_cmd.add_argument('--limit', type = int, default = 20)
+	export_cmd = commands.add_parser('export', help = 'print the latest sections of a run')
+	export_cmd.add_argument('run_id', type = int)
+	export_cmd.add_argument('--format', choices = ['plain', 'json'], default = 'plain')
+	history_cmd = commands.add_parser('history', help = 'print every version of a section')
+	history_cmd.add_argument('run_id', type = int)
+	history_cmd.add_argument('section')
+	args = parser.parse_args()
+
+	store = ResultStore(args.db)
+	if args.command == 'list':
+		pdf_hash = hash_file(args.pdf) if args.pdf is not None else None
+		for run in store.find_runs(pdf_hash, limit = args.limit):
+			print('{}\t{}\t{}\t{}'.format(run['id'], time.strftime('%Y-%m-%d %H:%M', time.localtime(run['created'])),
+				run['pdf_name'], json.dumps(run['params'])))
+	elif args.command == 'export':
+		if args.format == 'plain':
+			store.export_plain(args.run_id, sys.stdout)
+		else:
+			json.dump(store.export_json(args.run_id), sys.stdout, indent = 1)
+	elif args.command == 'history':
+		for version, created, text in store.get_history(args.run_id, args.section):
+			print('version {} ({}):'.format(version, time.strftime('%Y-%m-%d %H:%M', time.localtime(created))))
+			print(text)
+	store.close()
+
+if __name__ == "__main__":
+	main()
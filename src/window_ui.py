@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+
+# Form implementation generated from reading ui file 'window.ui'
+#
+# Created by: PyQt5 UI code generator 5.15.9
+#
+# WARNING: Any manual changes made to this file will be lost when pyuic5 is
+# run again.  Do not edit this file unless you know what you are doing.
+
+
+from PyQt5 import QtCore, QtGui, QtWidgets
+
+
+class Ui_pdf2eval(object):
+    def setupUi(self, pdf2eval):
+        pdf2eval.setObjectName("pdf2eval")
+        pdf2eval.resize(761, 249)
+        self.centralwidget = QtWidgets.QWidget(pdf2eval)
+        self.centralwidget.setObjectName("centralwidget")
+        self.pbar = QtWidgets.QProgressBar(self.centralwidget)
+        self.pbar.setGeometry(QtCore.QRect(20, 160, 251, 23))
+        self.pbar.setProperty("value", 0)
+        self.pbar.setObjectName("pbar")
+        self.verticalLayoutWidget = QtWidgets.QWidget(self.centralwidget)
+        self.verticalLayoutWidget.setGeometry(QtCore.QRect(20, 10, 221, 141))
+        self.verticalLayoutWidget.setObjectName("verticalLayoutWidget")
+        self.verticalLayout = QtWidgets.QVBoxLayout(self.verticalLayoutWidget)
+        self.verticalLayout.setContentsMargins(0, 0, 0, 0)
+        self.verticalLayout.setObjectName("verticalLayout")
+        self.browseBtn = QtWidgets.QPushButton(self.verticalLayoutWidget)
+        self.browseBtn.setObjectName("browseBtn")
+        self.verticalLayout.addWidget(self.browseBtn)
+        self.contextSummaryBtn = QtWidgets.QCheckBox(self.verticalLayoutWidget)
+        self.contextSummaryBtn.setObjectName("contextSummaryBtn")
+        self.verticalLayout.addWidget(self.contextSummaryBtn)
+        self.fullContextQABtn = QtWidgets.QCheckBox(self.verticalLayoutWidget)
+        self.fullContextQABtn.setObjectName("fullContextQABtn")
+        self.verticalLayout.addWidget(self.fullContextQABtn)
+        self.retrievalQABtn = QtWidgets.QCheckBox(self.verticalLayoutWidget)
+        self.retrievalQABtn.setObjectName("retrievalQABtn")
+        self.verticalLayout.addWidget(self.retrievalQABtn)
+        self.processBtn = QtWidgets.QPushButton(self.verticalLayoutWidget)
+        self.processBtn.setObjectName("processBtn")
+        self.verticalLayout.addWidget(self.processBtn)
+        self.messageLabel = QtWidgets.QLabel(self.centralwidget)
+        self.messageLabel.setGeometry(QtCore.QRect(20, 190, 171, 16))
+        self.messageLabel.setText("")
+        self.messageLabel.setObjectName("messageLabel")
+        self.horizontalLayoutWidget = QtWidgets.QWidget(self.centralwidget)
+        self.horizontalLayoutWidget.setGeometry(QtCore.QRect(250, 10, 211, 41))
+        self.horizontalLayoutWidget.setObjectName("horizontalLayoutWidget")
+        self.horizontalLayout = QtWidgets.QHBoxLayout(self.horizontalLayoutWidget)
+        self.horizontalLayout.setContentsMargins(0, 0, 0, 0)
+        self.horizontalLayout.setObjectName("horizontalLayout")
+        self.label_2 = QtWidgets.QLabel(self.horizontalLayoutWidget)
+        self.label_2.setObjectName("label_2")
+        self.horizontalLayout.addWidget(self.label_2)
+        self.apiKeyText = QtWidgets.QLineEdit(self.horizontalLayoutWidget)
+        self.apiKeyText.setObjectName("apiKeyText")
+        self.horizontalLayout.addWidget(self.apiKeyText)
+        self.verticalLayoutWidget_2 = QtWidgets.QWidget(self.centralwidget)
+        self.verticalLayoutWidget_2.setGeometry(QtCore.QRect(330, 60, 121, 160))
+        self.verticalLayoutWidget_2.setObjectName("verticalLayoutWidget_2")
+        self.verticalLayout_2 = QtWidgets.QVBoxLayout(self.verticalLayoutWidget_2)
+        self.verticalLayout_2.setContentsMargins(0, 0, 0, 0)
+        self.verticalLayout_2.setObjectName("verticalLayout_2")
+        self.label_3 = QtWidgets.QLabel(self.verticalLayoutWidget_2)
+        self.label_3.setObjectName("label_3")
+        self.verticalLayout_2.addWidget(self.label_3)
+        self.redoBtn1 = QtWidgets.QPushButton(self.verticalLayoutWidget_2)
+        self.redoBtn1.setObjectName("redoBtn1")
+        self.verticalLayout_2.addWidget(self.redoBtn1)
+        self.redoBtn2 = QtWidgets.QPushButton(self.verticalLayoutWidget_2)
+        self.redoBtn2.setObjectName("redoBtn2")
+        self.verticalLayout_2.addWidget(self.redoBtn2)
+        self.redoBtn3 = QtWidgets.QPushButton(self.verticalLayoutWidget_2)
+        self.redoBtn3.setObjectName("redoBtn3")
+        self.verticalLayout_2.addWidget(self.redoBtn3)
+        self.redoBtn4 = QtWidgets.QPushButton(self.verticalLayoutWidget_2)
+        self.redoBtn4.setObjectName("redoBtn4")
+        self.verticalLayout_2.addWidget(self.redoBtn4)
+        self.paraphraseBtn = QtWidgets.QPushButton(self.verticalLayoutWidget_2)
+        self.paraphraseBtn.setObjectName("paraphraseBtn")
+        self.verticalLayout_2.addWidget(self.paraphraseBtn)
+        self.verticalLayoutWidget_3 = QtWidgets.QWidget(self.centralwidget)
+        self.verticalLayoutWidget_3.setGeometry(QtCore.QRect(470, 10, 281, 211))
+        self.verticalLayoutWidget_3.setObjectName("verticalLayoutWidget_3")
+        self.verticalLayout_3 = QtWidgets.QVBoxLayout(self.verticalLayoutWidget_3)
+        self.verticalLayout_3.setContentsMargins(0, 0, 0, 0)
+        self.verticalLayout_3.setObjectName("verticalLayout_3")
+        self.label_4 = QtWidgets.QLabel(self.verticalLayoutWidget_3)
+        self.label_4.setObjectName("label_4")
+        self.verticalLayout_3.addWidget(self.label_4)
+        self.sampleWritingText = QtWidgets.QPlainTextEdit(self.verticalLayoutWidget_3)
+        self.sampleWritingText.setObjectName("sampleWritingText")
+        self.verticalLayout_3.addWidget(self.sampleWritingText)
+        pdf2eval.setCentralWidget(self.centralwidget)
+        self.statusbar = QtWidgets.QStatusBar(pdf2eval)
+        self.statusbar.setObjectName("statusbar")
+        pdf2eval.setStatusBar(self.statusbar)
+
+        self.retranslateUi(pdf2eval)
+        QtCore.QMetaObject.connectSlotsByName(pdf2eval)
+
+    def retranslateUi(self, pdf2eval):
+        _translate = QtCore.QCoreApplication.translate
+        pdf2eval.setWindowTitle(_translate("pdf2eval", "MainWindow"))
+        self.browseBtn.setText(_translate("pdf2eval", "Browse PDF"))
+        self.contextSummaryBtn.setText(_translate("pdf2eval", "Context-Aware Summary (Slow)"))
+        self.fullContextQABtn.setText(_translate("pdf2eval", "Full-Context Question Answering (Slow)"))
+        self.retrievalQABtn.setText(_translate("pdf2eval", "Retrieval Question Answering"))
+        self.processBtn.setText(_translate("pdf2eval", "Process"))
+        self.label_2.setText(_translate("pdf2eval", "API Key"))
+        self.label_3.setText(_translate("pdf2eval", "Tweaking"))
+        self.redoBtn1.setText(_translate("pdf2eval", "Redo Summary"))
+        self.redoBtn2.setText(_translate("pdf2eval", "Redo Interesting"))
+        self.redoBtn3.setText(_translate("pdf2eval", "Redo Dislike"))
+        self.redoBtn4.setText(_translate("pdf2eval", "Redo Question"))
+        self.paraphraseBtn.setText(_translate("pdf2eval", "Redo All"))
+        self.label_4.setText(_translate("pdf2eval", "Sample Writing to Imitate (recommend <= 2000 words)"))